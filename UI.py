@@ -5,29 +5,34 @@ Version: v1
 This module provides the user interface components for the Flake Maker application.
 It includes classes for UI elements such as buttons, text boxes, and knobs.
 """
-from math import sin, cos, pi
-import json
+from math import sin, cos
+from utils import PI_2, TWO_PI
+from config import (TEXT_COLOR, KNOB_COLOR, OUTLINE_COLOR, DISPLAY_COLOR, BASE_COLOR,
+	DISPLAY_FONT, DISPLAY_FONT_SIZE, DETAILS_COLOR, DETAILS_FONT, DETAILS_FONT_SIZE)
 import pygame
 
-# Load settings from a JSON file
-try:
-	with open('settings.json', 'r') as f:
-		s = json.load(f)
-		WINDOW_WIDTH = s['Window']['Width']
-		WINDOW_HEIGHT = s['Window']['Height']
-		TEXT_COLOR = s['UI']['ParamDisplay']['TextColor']
-		KNOB_COLOR = s['UI']['Knob']['Color']
-		OUTLINE_COLOR = s['UI']['OutLineColor']
-		DISPLAY_COLOR = s['UI']['ParamDisplay']['BackgroundColor']
-		BASE_COLOR = s['UI']['BackgroundColor']
-		DISPLAY_FONT = s['UI']['ParamDisplay']['Font']
-		DISPLAY_FONT_SIZE = s['UI']['ParamDisplay']['FontSize']
-		DETAILS_COLOR = s['UI']['Details']['TextColor']
-		DETAILS_FONT = s['UI']['Details']['Font']
-		DETAILS_FONT_SIZE = s['UI']['Details']['FontSize']
-except (FileNotFoundError, PermissionError) as e:
-	print(f"Error loading settings: {e}")
-	raise
+# Fonts are shared by every element using the same (name, size)
+_FONT_CACHE = {}
+
+def _get_font(name, size):
+	"""
+	Get a cached font, creating it on the first request.
+	The system font path is resolved only when a name is given, since the
+	lookup scans every installed font (and the default font doesn't need it).
+
+	Args:
+		name (str): The system font name, None for the default font.
+		size (int): The font size.
+
+	Returns:
+		pygame.font.Font: The font for the given name and size.
+	"""
+	key = (name, size)
+	font = _FONT_CACHE.get(key)
+	if font is None:
+		path = pygame.font.match_font(name) if name else None
+		font = _FONT_CACHE[key] = pygame.font.Font(path, size)
+	return font
 
 class BaseUI:
 	"""
@@ -35,6 +40,7 @@ class BaseUI:
 
 	Attributes:
 		rect (pygame.Rect): The rectangle defining position and size.
+		_bg (pygame.Surface): The pre-rendered background and outline.
 	"""
 	def __init__(self, centerX, centerY, width, height):
 		"""
@@ -47,6 +53,9 @@ class BaseUI:
 			height (int): The height of the UI element.
 		"""
 		self.rect = pygame.Rect(centerX - width/2, centerY - height/2, width, height)
+		self._bg = pygame.Surface(self.rect.size)
+		self._bg.fill(BASE_COLOR)
+		pygame.draw.rect(self._bg, OUTLINE_COLOR, self._bg.get_rect(), 5)
 
 	def draw(self, screen):
 		"""
@@ -55,8 +64,7 @@ class BaseUI:
 		Args:
 			screen (pygame.Surface): The screen to draw the UI element on.
 		"""
-		pygame.draw.rect(screen, BASE_COLOR, self.rect)
-		pygame.draw.rect(screen, OUTLINE_COLOR, self.rect, 5)
+		screen.blit(self._bg, self.rect.topleft)
 
 
 class TextBox:
@@ -66,8 +74,11 @@ class TextBox:
 	Attributes:
 		rect (pygame.Rect): The rectangle defining the text box's position and size.
 		font (pygame.font.Font): The font used for rendering text.
-		_base_text (str): The base text template with a placeholder for variable values.
+		_text_parts (list): The base text template, split at the placeholder for variable values.
 		_formatted_text (str): The formatted text with the variable value replaced.
+		_bg (pygame.Surface): The pre-rendered background and outline.
+		_cached_surface (pygame.Surface): The rendered text, None when it needs to be rendered again.
+		_cached_rect (pygame.Rect): The position of the rendered text.
 	"""
 
 	def __init__(self, centerX, centerY, width, height, text, value):
@@ -83,9 +94,14 @@ class TextBox:
 			value (str): The initial value to replace the placeholder in the text.
 		"""
 		self.rect = pygame.Rect(centerX - width/2, centerY - height/2, width, height)
-		self.font = pygame.font.SysFont(DISPLAY_FONT, DISPLAY_FONT_SIZE)
-		self._base_text = text
-		self._formatted_text = self._base_text.replace('VAR', str(value))
+		self._bg = pygame.Surface(self.rect.size)
+		self._bg.fill(DISPLAY_COLOR)
+		pygame.draw.rect(self._bg, OUTLINE_COLOR, self._bg.get_rect(), 4)
+		self.font = _get_font(DISPLAY_FONT, DISPLAY_FONT_SIZE)
+		self._text_parts = text.split('VAR')
+		self._formatted_text = str(value).join(self._text_parts)
+		self._cached_surface = None
+		self._cached_rect = None
 
 	@property
 	def text(self):
@@ -95,7 +111,10 @@ class TextBox:
 	@text.setter
 	def text(self, value):
 		"""Set the text by replacing the placeholder with the provided value."""
-		self._formatted_text = self._base_text.replace('VAR', str(value))
+		text = str(value).join(self._text_parts)
+		if text != self._formatted_text:
+			self._formatted_text = text
+			self._cached_surface = None
 
 	def draw(self, screen):
 		"""
@@ -104,11 +123,12 @@ class TextBox:
 		Args:
 			screen (pygame.Surface): The screen to draw the text box on.
 		"""
-		pygame.draw.rect(screen, DISPLAY_COLOR, self.rect)
-		pygame.draw.rect(screen, OUTLINE_COLOR, self.rect, 4)
-		text = self.font.render(self.text, True, TEXT_COLOR)
-		text_rect = text.get_rect(center=self.rect.center)
-		screen.blit(text, text_rect)
+		screen.blit(self._bg, self.rect.topleft)
+		# Only render the text again when it has changed
+		if self._cached_surface is None:
+			self._cached_surface = self.font.render(self.text, True, TEXT_COLOR)
+			self._cached_rect = self._cached_surface.get_rect(center=self.rect.center)
+		screen.blit(self._cached_surface, self._cached_rect)
 
 
 class Knob:
@@ -120,6 +140,8 @@ class Knob:
 		y (int): The y-coordinate of the knob's center.
 		radius (int): The radius of the knob.
 		angle (float): The angle of the knob's pointer.
+		_base_surface (pygame.Surface): The pre-rendered circles of the knob.
+		_base_pos (tuple): The position where the circles are blitted.
 	"""
 	def __init__(self, x, y, radius):
 		"""
@@ -133,7 +155,15 @@ class Knob:
 		self.x = x
 		self.y = y
 		self.radius = radius
-		self.angle = pi/2
+		self.angle = PI_2
+
+		# The circles never change, so they are drawn only once
+		left, top = int(x - radius) - 1, int(y - radius) - 1
+		size = int(2 * radius) + 3
+		self._base_surface = pygame.Surface((size, size), pygame.SRCALPHA)
+		pygame.draw.circle(self._base_surface, KNOB_COLOR, (x - left, y - top), radius)
+		pygame.draw.circle(self._base_surface, OUTLINE_COLOR, (x - left, y - top), radius, 5)
+		self._base_pos = (left, top)
 
 	def draw(self, screen):
 		"""
@@ -143,14 +173,14 @@ class Knob:
 			screen (pygame.Surface): The screen to draw the knob on.
 		"""
 		# Draw the knob circles
-		pygame.draw.circle(screen, KNOB_COLOR, (self.x, self.y), self.radius)
-		pygame.draw.circle(screen, OUTLINE_COLOR, (self.x, self.y), self.radius, 5)
+		screen.blit(self._base_surface, self._base_pos)
 
-		# Calculate the positions for the pointer line
-		outer_x = self.x + self.radius * cos(self.angle)
-		outer_y = self.y - self.radius * sin(self.angle)
-		inner_x = self.x + (self.radius - 15) * cos(self.angle)
-		inner_y = self.y - (self.radius - 15) * sin(self.angle)
+		# Calculate the positions for the pointer line, sharing the cosine and sine of the angle
+		c, s = cos(self.angle), sin(self.angle)
+		outer_x = self.x + self.radius * c
+		outer_y = self.y - self.radius * s
+		inner_x = self.x + (self.radius - 15) * c
+		inner_y = self.y - (self.radius - 15) * s
 
 		# Draw the pointer line
 		pygame.draw.line(screen, OUTLINE_COLOR, (outer_x, outer_y), (inner_x, inner_y), 5)
@@ -165,7 +195,7 @@ class Knob:
 		"""
 		self.angle += amount
 		# Modulate the angle to a (0, 2*pi) interval
-		self.angle %= 2 * pi
+		self.angle %= TWO_PI
 
 
 class InfoText:
@@ -176,8 +206,10 @@ class InfoText:
 		centerX (int): The x-coordinate of the text's center position.
 		centerY (int): The y-coordinate of the text's center position.
 		font (pygame.font.Font): The font used for rendering text.
-		_base_text (str): The base text template with a placeholder for variable values.
+		_text_parts (list): The base text template, split at the placeholder for variable values.
 		_formatted_text (str): The formatted text with the variable value replaced.
+		_cached_surface (pygame.Surface): The rendered text, None when it needs to be rendered again.
+		_cached_rect (pygame.Rect): The position of the rendered text.
 	"""
 	def __init__(self, centerX, centerY, text, value):
 		"""
@@ -192,9 +224,11 @@ class InfoText:
 		self.centerX = centerX
 		self.centerY = centerY
 
-		self.font = pygame.font.SysFont(DETAILS_FONT, DETAILS_FONT_SIZE)
-		self._base_text = text
-		self._formatted_text = self._base_text.replace('VAR', str(value))
+		self.font = _get_font(DETAILS_FONT, DETAILS_FONT_SIZE)
+		self._text_parts = text.split('VAR')
+		self._formatted_text = str(value).join(self._text_parts)
+		self._cached_surface = None
+		self._cached_rect = None
 
 	@property
 	def text(self):
@@ -204,7 +238,10 @@ class InfoText:
 	@text.setter
 	def text(self, value):
 		"""Set the text by replacing the placeholder with the provided value."""
-		self._formatted_text = self._base_text.replace('VAR', str(value))
+		text = str(value).join(self._text_parts)
+		if text != self._formatted_text:
+			self._formatted_text = text
+			self._cached_surface = None
 
 	def draw(self, screen):
 		"""
@@ -213,6 +250,8 @@ class InfoText:
 		Args:
 			screen (pygame.Surface): The screen to draw the text on.
 		"""
-		text = self.font.render(self.text, True, DETAILS_COLOR)
-		text_rect = text.get_rect(center=(self.centerX, self.centerY))
-		screen.blit(text, text_rect)
\ No newline at end of file
+		# Only render the text again when it has changed
+		if self._cached_surface is None:
+			self._cached_surface = self.font.render(self.text, True, DETAILS_COLOR)
+			self._cached_rect = self._cached_surface.get_rect(center=(self.centerX, self.centerY))
+		screen.blit(self._cached_surface, self._cached_rect)
\ No newline at end of file
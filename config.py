@@ -0,0 +1,44 @@
+# Flake Maker by Jutier
+# Version: v1.2
+
+# This module loads 'settings.json' once and exposes its values as constants for the other modules.
+
+import json
+
+# Load settings from a JSON file
+try:
+	with open('settings.json', 'r') as f:
+		s = json.load(f)
+except (FileNotFoundError, PermissionError) as e:
+	print(f"Error loading settings: {e}")
+	raise
+
+FPS = s['FPS']
+SIM_RATE = s['SimulationRate']
+
+# Window
+WINDOW_WIDTH = s['Window']['Width']
+WINDOW_HEIGHT = s['Window']['Height']
+
+# Snowflake
+BACKGROUND_COLOR = s['Snowflake']['Colors']['BackGround']
+YOUNG_COLOR = s['Snowflake']['Colors']['Young']
+OLD_COLOR = s['Snowflake']['Colors']['Old']
+MAX_GROWTH = s['Snowflake']['MaxGrowth']
+INITIAL_THICKNESS = s['Snowflake']['Thick']
+BRANCH_CROSSING = s['Snowflake']['BranchCrossing']
+MAX_CYCLES = s['Snowflake']['MaxBranching']
+
+# UI
+BASE_COLOR = s['UI']['BackgroundColor']
+OUTLINE_COLOR = s['UI']['OutLineColor']
+DISPLAY_WIDTH = s['UI']['ParamDisplay']['Width']
+DISPLAY_HEIGHT = s['UI']['ParamDisplay']['Height']
+DISPLAY_COLOR = s['UI']['ParamDisplay']['BackgroundColor']
+TEXT_COLOR = s['UI']['ParamDisplay']['TextColor']
+DISPLAY_FONT = s['UI']['ParamDisplay']['Font']
+DISPLAY_FONT_SIZE = s['UI']['ParamDisplay']['FontSize']
+KNOB_COLOR = s['UI']['Knob']['Color']
+DETAILS_COLOR = s['UI']['Details']['TextColor']
+DETAILS_FONT = s['UI']['Details']['Font']
+DETAILS_FONT_SIZE = s['UI']['Details']['FontSize']
@@ -3,9 +3,12 @@
 
 # This module manages the growth of snowflakes using a branching algorithm.
 
-from math import sin, cos, tan, pi, degrees
-from utils import rotatePoints, interp
-import json
+from math import sin, cos
+from utils import rotateSegments, rotateSegmentsTrig, interp, PI_2, PI_3, PI_6, TWO_PI, TAN_PI_3
+
+
+# Cosine and sine of the six rotations of the radial symmetry, they never change
+SYMMETRY = tuple((cos(i*PI_3), sin(i*PI_3)) for i in range(6))
 
 
 class Line:
@@ -14,18 +17,23 @@ class Line:
 
 	Attributes:
 		snowflake (Snowflake): The parent snowflake object.
-		angle (float): The angle of the line segment.
+		angle (float): The angle of the line segment, fixed after creation.
 		parent (Line): The parent line segment.
 		depth (int): The 'depth' of the line in the snowflake (it's reversed).
 		start (tuple): The starting point of the line segment.
 		length (float): The length of the line segment.
 		thick (float): The thickness of the line segment.
+		width (int): The whole part of the thickness, used to draw the line.
 		buildup (float): Accumulated buildup for branching.
 		growth (float): Remaining growth potential.
 		children (list): List of child line segments.
 		lastChild (float): Time of the last child creation.
 	"""
 
+	# Lines are the most common objects, slots make their attributes faster and lighter than a __dict__
+	__slots__ = ('snowflake', 'parent', 'depth', 'start', 'length', 'thick', 'width', 'buildup', 'growth',
+		'children', 'lastChild', 'angle', '_cos', '_sin', '_end', '_dead', '_changed')
+
 
 	def __init__(self, snowflake, angle=0, parent=None):
 		"""
@@ -37,31 +45,61 @@ class Line:
 			parent (Line, optional): The parent line segment. Defaults to None.
 		"""
 		self.snowflake = snowflake
+		self._end = None
+		# The angle never changes after creation, so its cosine and sine are kept for the end point
 		self.angle = angle
+		self._cos = cos(angle)
+		self._sin = sin(angle)
 		self.parent = parent
-		try:
-			self.depth = self.parent.depth + 1
-		except:
+		if parent is None:
 			self.depth = 0
-		try:
-			self.start = self.parent.end
-		except:
 			self.start = (0, 0)
+		else:
+			self.depth = parent.depth + 1
+			self.start = parent.end
 		self.length = 0
 		self.thick = self.snowflake.min_thick
+		self.width = int(self.thick)
 		self.buildup = 0
 		self.growth = self.snowflake.max_growth
 		self.children = []
 		self.lastChild = self.snowflake.elapsedTime
+		self._dead = False
+		self._changed = True # New lines haven't been drawn yet
 
 	@property
 	def color(self):
 		"""Changes the line color according to it's age/growth."""
-		return self.colorGradient(self.growth)
+		return self.snowflake.lineColor(self.growth)
 
 	@property
 	def end(self):
-		return (self.length*cos(self.angle) + self.start[0], -self.length*sin(self.angle)+self.start[1])
+		"""The end point is cached, it only changes when the line grows."""
+		if self._end is None:
+			self._end = (self.length*self._cos + self.start[0], -self.length*self._sin+self.start[1])
+		return self._end
+
+
+	def _grow(self, amount):
+		"""
+		Increase the line length, invalidating the cached end point.
+
+		Args:
+			amount (float): The length to be added.
+		"""
+		self.length += amount
+		self._end = None
+
+
+	def _thicken(self, amount):
+		"""
+		Increase the line thickness, keeping its drawing width up to date.
+
+		Args:
+			amount (float): The thickness to be added.
+		"""
+		self.thick += amount
+		self.width = int(self.thick)
 
 
 	def okToBranch(self, temperature):
@@ -89,7 +127,7 @@ class Line:
 		return (timeReq and childReq and depthReq and tempReq)
 
 
-	def branch(self, angle=pi/3):
+	def branch(self, angle=PI_3):
 		"""
 		Create a new child Line branching from this line.
 
@@ -97,8 +135,10 @@ class Line:
 			angle (float, optional): The angle at which to branch. Defaults to pi/3.
 		"""
 		self.snowflake.cycles += 1
+		self.snowflake._dirty = True
+		self.snowflake._frozen = False
 		self.lastChild = self.snowflake.elapsedTime
-		NewBorns = Line(self.snowflake, (self.angle - angle)%(2*pi), self)
+		NewBorns = Line(self.snowflake, (self.angle - angle)%TWO_PI, self)
 		self.children.append(NewBorns)
 		self.snowflake.branch.append(NewBorns)
 
@@ -113,40 +153,33 @@ class Line:
 		Returns:
 			tuple: The interpolated color.
 		"""
-		MAX_GROWTH = self.snowflake.max_growth
-		OLD_COLOR = self.snowflake.color_old
-		YOUNG_COLOR = self.snowflake.color_young
-		r = int(interp(value, 0, MAX_GROWTH, OLD_COLOR[0], YOUNG_COLOR[0]))
-		g = int(interp(value, 0, MAX_GROWTH, OLD_COLOR[1], YOUNG_COLOR[1]))
-		b = int(interp(value, 0, MAX_GROWTH, OLD_COLOR[2], YOUNG_COLOR[2]))
-		return (r, g, b)
+		return self.snowflake.colorGradient(value)
 
 
-	def draw(self, angle=pi/2):
+	def draw(self):
 		"""
-		Draw the line segment and its mirrored counterparts, 'angle' refers to the whole branch.
+		Draw the line segment and its mirrored counterparts, in each of the six rotations of the snowflake.
 		Radial symmetry is established here with the angle from parents.
-
-		Args:
-			angle (float, optional): The branch angle. Defaults to pi/2.
 		"""
 
 		cousins = [(self.start, self.end)]
-		self.snowflake.drawLine(self, rotatePoints(cousins[0], self.snowflake.center, angle))
 
 		line = self
 		dad = line.parent
 		while dad:
-			newCousins = []
+			# Each ancestor mirrors every cousin found so far
 			rotation = (dad.angle - line.angle) * 2
-			for cousin in cousins:
-				newCousin = rotatePoints(cousin, line.start, rotation)
-				newCousins.append(newCousin)
-				self.snowflake.drawLine(self, rotatePoints(newCousin, self.snowflake.center, angle))
-			cousins.extend(newCousins)
+			cousins.extend(rotateSegments(cousins, line.start, rotation))
 			line = dad
 			dad = line.parent
 
+		# All the segments share the same color and thickness, so the six rotations are drawn at once
+		center = self.snowflake.center
+		segments = []
+		for c, s in SYMMETRY:
+			segments.extend(rotateSegmentsTrig(cousins, center, c, s))
+		self.snowflake.drawLines(self, segments)
+
 
 
 
@@ -180,14 +213,47 @@ class Snowflake():
 		self.cycles = 0
 		self.elapsedTime = 0
 
-		self.branch = [Line(self, pi/2)]
+		# Set whenever a branch changes, the branches are only drawn again when needed
+		self._dirty = True
+		# Set when a branch is purged, so the branch list is only rebuilt when needed
+		self._purged = False
+		# Set when every branch has used up its growth, so updates can be skipped
+		self._frozen = False
+
+		self.branch = [Line(self, PI_2)]
 		self.branch[0].start = self.center
 
 
 
+	def colorGradient(self, value):
+		"""
+		Calculate the color gradient for a given growth.
+
+		Args:
+			value (float): The value to interpolate.
+
+		Returns:
+			tuple: The interpolated color.
+		"""
+		return tuple(int(interp(value, 0, self.max_growth, old, young)) for old, young in zip(self.color_old, self.color_young))
+
+	def lineColor(self, growth):
+		"""
+		Gives the color of a line with the given growth, subclasses that redraw often can read it from a table.
+
+		Args:
+			growth (float): The growth left on the line.
+
+		Returns:
+			tuple: The color of the line.
+		"""
+		return self.colorGradient(growth)
+
+
 	def update(self, humidity, temperature, dt):
 		"""
 		Update all of the the snowflake's current branches individually and draws them.
+		Everything that only depends on the conditions is computed once here, instead of once per branch.
 
 		Args:
 			humidity (float): The current humidity.
@@ -195,16 +261,42 @@ class Snowflake():
 			dt (float): The time delta since the last update.
 		"""
 		self.elapsedTime += dt
+		if self._frozen: # No branch can grow anymore, nothing would change
+			return
 		currentBranch = self.branch
 
+		growthInterp = (interp(humidity, 0, 100, 0, 0.7) + interp(temperature, -5, -20, 0, 0.3))
+		branchAngle = interp(temperature, -10, -20, PI_6, PI_3)
+		thicken = growthInterp > 0.3 and humidity > -4 * (temperature) and humidity < 50
+
+		# Names used inside the loop are bound locally, once
+		updateBranch = self.updateBranch
+		crossing = self.branch_crossing
+		tan60 = TAN_PI_3
+
+		cycles = None
+		growing = False
 		for l in currentBranch:
-			if self.branch_crossing or -l.end[1] >= abs(l.end[0] * tan(pi/3)): # This should prevent lines from growing outside the cone.
-				self.updateBranch(l, humidity, temperature, dt)
-			else:
-				self.purge(l)
+			# Branching events change the threshold for the following branches
+			if cycles != self.cycles:
+				cycles = self.cycles
+				depthThreshold = interp(temperature, -5, -20, -1, 3*cycles/4)
+
+			if not crossing:
+				x, y = l.end
+				if -y < abs(x * tan60): # This should prevent lines from growing outside the cone.
+					self.purge(l)
+					continue
 
+			updateBranch(l, temperature, dt, depthThreshold, growthInterp, branchAngle, thicken)
+			if l.growth > 0:
+				growing = True
 
-	def updateBranch(self, branch, humidity, temperature, dt):
+		self._frozen = not growing
+		self.sweep()
+
+
+	def updateBranch(self, branch, temperature, dt, depthThreshold, growthInterp, branchAngle, thicken):
 		"""
 		Update one individual branch based on the parameters.
 
@@ -212,26 +304,29 @@ class Snowflake():
 
 		Args:
 			branch (Line): The branch to update.
-			humidity (float): The current humidity.
 			temperature (float): The current temperature.
 			dt (float): The time delta since the last update.
+			depthThreshold (float): The minimum depth for a branch to grow.
+			growthInterp (float): The growth multiplier for the current humidity and temperature.
+			branchAngle (float): The angle of new branches.
+			thicken (bool): Whether the conditions make branches thicker.
 		"""
 		if branch.growth > 0:
-			if branch.depth >= interp(temperature, -5, -20, -1, 3*self.cycles/4):
-				growthInterp = (interp(humidity, 0, 100, 0, 0.7) + interp(temperature, -5, -20, 0, 0.3))
-				branch.length += 20 * growthInterp * dt
+			if branch.depth >= depthThreshold:
+				self._dirty = True
+				branch._changed = True
+				branch._grow(20 * growthInterp * dt)
 				branch.growth -= 1 * dt
 
 				if growthInterp < 0.35 and branch.okToBranch(temperature):
 					branch.buildup += 2 * dt
 					if branch.buildup >= 4:
-						angle = interp(temperature, -10, -20, pi/6, pi/3)
-						branch.branch(angle)
+						branch.branch(branchAngle)
 						branch.buildup = 0
 						branch.growth -= 0.2 * dt
 
-				elif growthInterp > 0.3 and humidity > -4 * (temperature) and humidity < 50:
-					branch.thick += 0.4 * dt
+				elif thicken:
+					branch._thicken(0.4 * dt)
 					branch.growth -= 0.1 * dt
 
 
@@ -240,10 +335,16 @@ class Snowflake():
 		"""
 		Draw each branche of the snowflake six times.
 		The six-fold radial symmetry is forced due to the symmetry of the molecule.
+		Only the branches that changed since the last call are drawn again,
+		the others are already on the image.
 		"""
+		if not self._dirty:
+			return
 		for line in self.branch:
-			for i in range(6):
-				line.draw(i*pi/3)
+			if line._changed:
+				line.draw()
+				line._changed = False
+		self._dirty = False
 
 
 
@@ -263,15 +364,39 @@ class Snowflake():
 		raise NotImplementedError('The "drawLine" method must be implemented by a subclass.\nPlease implement: drawLine(self, line: Line, points: Tuple[Tuple[float, float], Tuple[float, float]])')
 
 
+	def drawLines(self, line, segments):
+		"""
+		Draw several segments that belong to the same line.
+
+		It calls "drawLine" for each segment, subclasses can override it to
+		draw the whole batch with less overhead, since the color and thickness
+		are the same for every segment.
+
+		Args:
+			line (Line): Line object that made the original call, can be used to get color, thickness, etc.
+			segments (list): The (start, end) points of each segment to be drawn.
+		"""
+		for points in segments:
+			self.drawLine(line, points)
+
+
 	def purge(self, line):
 		"""
-		Remove a branch from the snowflake.
+		Mark a branch to be removed from the snowflake.
 		It was made to optimize resources, it needs improvements.
+		The branch is only taken out of '.branch' on the next sweep, so it's safe to purge while iterating it.
 
 		Args:
 			line (Line): The branch to remove.
 		"""
-		self.branch.remove(line)
+		line._dead = True
+		self._purged = True
 		for c in line.children:
 			c.parent = None
-		del(line)
\ No newline at end of file
+
+
+	def sweep(self):
+		"""Remove every purged branch from the snowflake, in a single pass, if any was purged."""
+		if self._purged:
+			self.branch = [l for l in self.branch if not l._dead]
+			self._purged = False
\ No newline at end of file
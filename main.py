@@ -6,31 +6,18 @@
 
 from flake import Snowflake
 from UI import InfoText, TextBox, Knob, BaseUI
+from config import (WINDOW_WIDTH, WINDOW_HEIGHT, DISPLAY_WIDTH, DISPLAY_HEIGHT, BACKGROUND_COLOR,
+	YOUNG_COLOR, OLD_COLOR, MAX_GROWTH, INITIAL_THICKNESS, BRANCH_CROSSING, MAX_CYCLES, FPS, SIM_RATE)
 from datetime import datetime
 from math import pi
-import json
+from time import perf_counter
 import pygame
 import asyncio
 
-# Load settings from a JSON file
-try:
-	with open('settings.json', 'r') as f:
-		s = json.load(f)
-		WINDOW_WIDTH = s['Window']['Width']
-		WINDOW_HEIGHT = s['Window']['Height']
-		DISPLAY_WIDTH = s['UI']['ParamDisplay']['Width']
-		DISPLAY_HEIGHT = s['UI']['ParamDisplay']['Height']
-		BACKGROUNG_COLOR = s['Snowflake']['Colors']['BackGround']
-		YOUNG_COLOR = s['Snowflake']['Colors']['Young']
-		OLD_COLOR = s['Snowflake']['Colors']['Old']
-		MAX_GROWTH = s['Snowflake']['MaxGrowth']
-		INITIAL_THICKNESS = s['Snowflake']['Thick']
-		BRANCH_CROSSING = s['Snowflake']['BranchCrossing']
-		MAX_CYCLES = s['Snowflake']['MaxBranching']
-		FPS = s['FPS']
-except (FileNotFoundError, PermissionError) as e:
-	print(f"Error loading settings: {e}")
-	raise
+# Looked up once at import, instead of on every draw
+_draw_line = pygame.draw.line
+# Resolution of the color table, in steps per unit of growth
+COLOR_STEPS = 10
 
 class PyGFlake(Snowflake):
 	"""
@@ -41,8 +28,24 @@ class PyGFlake(Snowflake):
 	def __init__(self, *args, **kwargs):
 		"""Initialize a PyGFlake, adding image on top of base class."""
 		super().__init__(*args, **kwargs)
+		# Growing lines are redrawn every frame, so colors are precomputed for every 1/COLOR_STEPS of growth,
+		# as pygame Colors, which it parses faster than tuples on every draw call
+		self._color_lut = [pygame.Color(*self.colorGradient(v / COLOR_STEPS)) for v in range(int(self.max_growth * COLOR_STEPS) + 1)]
 		self.image = pygame.Surface((WINDOW_WIDTH, WINDOW_WIDTH))
-		self.image.fill(BACKGROUNG_COLOR)
+		self.image.fill(BACKGROUND_COLOR)
+
+	def lineColor(self, growth):
+		"""Reads the color of a line with the given growth from the color table."""
+		lut = self._color_lut
+		return lut[max(0, min(len(lut) - 1, int(growth * COLOR_STEPS)))]
+
+	def drawBranches(self):
+		"""Draws the branches with the surface locked once, instead of once per line drawn."""
+		self.image.lock()
+		try:
+			super().drawBranches()
+		finally:
+			self.image.unlock()
 
 	def drawLine(self, line, points):
 		"""
@@ -53,7 +56,21 @@ class PyGFlake(Snowflake):
 			points (tuple of tuple): The start and end points of the line to be drawn.
 		"""
 		p0, p1 = points
-		pygame.draw.line(self.image, line.color, p0, p1, int(line.thick))
+		_draw_line(self.image, line.color, p0, p1, line.width)
+
+	def drawLines(self, line, segments):
+		"""
+		Draws all the segments of a line, looking up its properties only once.
+
+		Args:
+			line (object): The line object containing color and thickness information.
+			segments (list): The start and end points of each segment to be drawn.
+		"""
+		image = self.image
+		color = line.color
+		width = line.width
+		for p0, p1 in segments:
+			_draw_line(image, color, p0, p1, width)
 
 
 class Game:
@@ -147,6 +164,33 @@ class Game:
 		del self.snowflake
 		self._createFlake()
 
+async def simulate(game):
+	"""
+	Grows the snowflake in fixed time steps, independently of the render frame rate.
+
+	The elapsed wall time is accumulated, so frames that block the event loop
+	are caught up with several steps instead of stalling the growth.
+
+	Args:
+		game (Game): The Game object managing the game state.
+	"""
+	step = 1 / SIM_RATE
+	last = perf_counter()
+	lag = 0
+	while game.running:
+		now = perf_counter()
+		# Capped so a long stall doesn't freeze the game with a burst of steps
+		lag = min(lag + now - last, 0.25)
+		last = now
+
+		if game.stopGrowth:
+			lag = 0
+		while lag >= step:
+			game.snowflake.update(game.humidity, game.temperature, step)
+			lag -= step
+
+		await asyncio.sleep(step)
+
 # Async function needed to use WebAssembly and run on browser with pygbag
 async def main(game):
 	"""
@@ -155,7 +199,12 @@ async def main(game):
 	Args:
 		game (Game): The Game object managing the game state.
 	"""
+	simulation = asyncio.create_task(simulate(game))
+
 	while game.running:
+		if simulation.done(): # It only stops early if the snowflake update failed
+			simulation.result() # Raises that error here, instead of rendering a flake that stopped growing
+
 		dt = game.clock.tick(FPS) / 1000
 		keys_pressed = pygame.key.get_pressed()
 
@@ -188,9 +237,8 @@ async def main(game):
 			if game.humidity > 0:
 				game.hmdtChange(-10 * dt)
 
-		if not game.stopGrowth:
-			game.snowflake.update(game.humidity, game.temperature, dt)
-			game.snowflake.drawBranches()
+		# Only draws the lines changed by the simulation since the last frame
+		game.snowflake.drawBranches()
 
 		game.screen.blit(game.snowflake.image, (0, 0))
 
@@ -204,6 +252,7 @@ async def main(game):
 
 		await asyncio.sleep(0)
 
+	await simulation
 	pygame.quit()
 
 if __name__ == '__main__':
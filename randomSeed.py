@@ -9,6 +9,13 @@ import numpy as np
 from flake import Snowflake
 from PIL import Image, ImageDraw
 from os import urandom
+from functools import lru_cache, partial
+from collections import OrderedDict
+from math import ceil, sqrt
+from multiprocessing import Pool
+
+# Empty hasher, copied for each seed instead of setting up a new one
+_SHA = hashlib.sha256()
 
 def hashSeed(seed, salt=False):
 	"""
@@ -21,11 +28,55 @@ def hashSeed(seed, salt=False):
 	Returns:
 		str: The resulting SHA256 hash in hexadecimal format.
 	"""
-	encoded_seed = str(seed).encode() # Convert the seed to bytes
+	sha = _SHA.copy()
+	# Convert the seed to bytes, the text of any other type is hashed so the same seed always gives the same flake
+	sha.update(seed.encode() if isinstance(seed, str) else str(seed).encode())
 	if salt:
-		encoded_seed += urandom(16)
-	sha = hashlib.sha256(encoded_seed).hexdigest()
-	return sha
+		sha.update(urandom(16)) # Same as hashing the concatenation, without building it
+	return sha.hexdigest()
+
+# Hasher already fed with the 'random' seed, copied for each salted random hash
+_RANDOM_SHA = hashlib.sha256(b'random')
+
+def _randomHashes(n):
+	"""
+	Generates n salted hashes of the 'random' seed, same as calling hashSeed('random', True) n times.
+	All the salts are read in a single call, and the seed is only hashed once.
+
+	Args:
+		n (int): The number of hashes to generate.
+
+	Returns:
+		list of str: The resulting SHA256 hashes in hexadecimal format.
+	"""
+	salts = urandom(16 * n)
+	hashes = []
+	for i in range(0, 16 * n, 16):
+		sha = _RANDOM_SHA.copy()
+		sha.update(salts[i:i + 16])
+		hashes.append(sha.hexdigest())
+	return hashes
+
+# Nibble value of each ASCII hexadecimal character, anything else is marked as 0xff
+_HEX_LUT = np.full(256, 0xff, dtype=np.uint8)
+_HEX_LUT[np.frombuffer(b'0123456789', dtype=np.uint8)] = range(10)
+_HEX_LUT[np.frombuffer(b'abcdef', dtype=np.uint8)] = range(10, 16)
+_HEX_LUT[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = range(10, 16)
+
+@lru_cache(maxsize=None)
+def _evoTable(target_min, target_max, decimal):
+	"""
+	Builds the 16 possible values of evoVal for a given range, they are the same for every hash.
+
+	Args:
+		target_min (float): The minimum value of the target range.
+		target_max (float): The maximum value of the target range.
+		decimal (int): The number of decimal places to round the result.
+
+	Returns:
+		np.ndarray: The value of each hexadecimal digit, from 0 to 15.
+	"""
+	return np.array([round(interp(n, 0, 15, target_min, target_max), decimal) for n in range(16)])
 
 def evoVal(hex_string, target_min, target_max, decimal=3):
 	"""
@@ -41,40 +92,59 @@ def evoVal(hex_string, target_min, target_max, decimal=3):
 	Returns:
 		list of float: A list of values mapped to the specified range.
 	"""
-	evo_list = []
-	for n_16 in hex_string:
-		n = int(n_16, 16) # Convert hex string to integer
-		value = interp(n, 0, 15, target_min, target_max)
-		evo_list.append(round(value, decimal))
-	return evo_list
+	nibbles = _HEX_LUT[np.frombuffer(hex_string.encode(), dtype=np.uint8)] # One lookup per character
+	if (nibbles == 0xff).any():
+		raise ValueError(f"non-hexadecimal character in {hex_string!r}")
+	return _evoTable(target_min, target_max, decimal)[nibbles].tolist()
 
 def hash2Img(image, sha):
 	"""
 	Embeds a SHA256 hash into an image by modifying the least significant bit (LSB) of the
 	red and green channels of the image with the corresponding bits from the hash.
+	Only the first 128 pixels of the top row are touched, the image is modified in place.
 
 	Args:
 		image (PIL.Image): The input image to embed the hash into.
 		sha (str): The SHA256 hash to embed into the image (in hexadecimal format).
 
 	Returns:
-		PIL.Image: The image with the embedded hash.
+		PIL.Image: The same image, with the embedded hash.
 	"""
-	pixels = np.array(image)
-	lin, col = 0, 0
-	bin_sha = bin(int(sha, 16))[2:].zfill(256) # Convert the SHA hash to a 256-bit binary string
+	width, height = image.size
+	if width < 128: # crop would pad the missing pixels with zeros, and paste would cut the hash short
+		raise ValueError(f"the hash needs an image at least 128 pixels wide, the image is {width}x{height}")
+	row = np.array(image.crop((0, 0, 128, 1)))[0] # Copy only the pixels holding the hash
+	bits = np.unpackbits(np.frombuffer(bytes.fromhex(sha), dtype=np.uint8)) # The SHA hash as 256 bits
 
-	for i in range(0, len(bin_sha), 2):
-		r, g, b = pixels[lin, col]
+	# Even bits go to the red channel and odd bits to the green one, one pair per pixel
+	row[:, 0] = (row[:, 0] & 0xfe) | bits[0::2]
+	row[:, 1] = (row[:, 1] & 0xfe) | bits[1::2]
 
-		r = (r & 0xfe) | int(bin_sha[i], 2)
-		g = (g & 0xfe) | int(bin_sha[i+1], 2)
+	image.paste(Image.fromarray(row[np.newaxis]), (0, 0))
+	return image
+
+def _embedHashes(pixels, hash_list, size, columns):
+	"""
+	Embeds the hash of every flake of a collage at once, the same way hash2Img does for a single flake.
 
-		pixels[lin, col] = [r, g, b]
+	Args:
+		pixels (np.ndarray): The RGB pixels of the collage, modified in place.
+		hash_list (list): The SHA256 hashes of the flakes, in collage order (row-wise).
+		size (int): The size of each flake.
+		columns (int): The number of flake columns on the collage.
+	"""
+	if size < 128: # Each hash would spill over into the next flake
+		raise ValueError(f"the hash needs flakes at least 128 pixels wide, the flakes are {size}x{size}")
+	N = len(hash_list)
+	# The bits of all the hashes, as one red/green pair per pixel of each flake
+	bits = np.unpackbits(np.frombuffer(bytes.fromhex(''.join(hash_list)), dtype=np.uint8)).reshape(N, 128, 2)
 
-		col += 1
+	# Coordinates of the first 128 pixels of the top row of every flake
+	lins, cols = np.divmod(np.arange(N), columns)
+	lins = (lins * size)[:, np.newaxis]
+	cols = (cols * size)[:, np.newaxis] + np.arange(128)
 
-	return Image.fromarray(pixels)
+	pixels[lins, cols, :2] = (pixels[lins, cols, :2] & 0xfe) | bits
 
 def img2Hash(image, pos):
 	"""
@@ -88,19 +158,15 @@ def img2Hash(image, pos):
 	Returns:
 		str: The extracted SHA256 hash in hexadecimal format.
 	"""
-	pixels = np.array(image)
 	lin, col = pos
-	extracted_bin = 0
-
-	for i in range(128):
-		r, g, _ = pixels[lin, col]
+	width, height = image.size
+	if not (0 <= lin < height and 0 <= col <= width - 128): # crop would pad the missing pixels with zeros
+		raise ValueError(f"no hash can be read at {pos}, the image is {width}x{height}")
+	strip = np.asarray(image.crop((col, lin, col + 128, lin + 1))) # Only the 128 pixels holding the hash
 
-		#Extract the LSB of red and green channels, int conversion for size
-		extracted_bin = int(extracted_bin << 2) | int((r & 1) << 1) | int(g & 1)
-
-		col += 1
-
-	hex_hash = hex(extracted_bin)[2:].zfill(64)
+	# Interleave the LSB of red and green channels, pixel by pixel, and pack them back into bytes
+	bits = (strip[0, :, :2] & 1).reshape(-1)
+	hex_hash = np.packbits(bits).tobytes().hex()
 
 	return hex_hash
 
@@ -158,22 +224,38 @@ class PillowFlake(Snowflake):
 		Returns:
 			None: This method modifies the image directly and does not return any value.
 		"""
-		self.imgDraw.line(points, fill=line.color, width=int(line.thick)*2)
+		self.imgDraw.line(points, fill=line.color, width=line.width*2)
 
+	def drawLines(self, line, segments):
+		"""
+		Draws all the segments of a line, looking up its properties only once.
 
+		Args:
+			line (object): The Line object containing color and thickness information.
+			segments (list): The start and end points of each segment to be drawn.
+		"""
+		width = line.width*2
+		if not width: # ImageDraw.line doesn't draw anything either
+			return
 
-def flakeFromHash(sha, dt=1, **kwargs):
+		draw_line = self.imgDraw.line
+		color = line.color
+		for points in segments:
+			draw_line(points, fill=color, width=width)
+
+
+
+def _growFlake(sha, dt=1, **kwargs):
 	"""
-	Generates a flake image based on a SHA256 hash.
-	The used hash is embedded to the image with steganography.
+	Grows and draws a flake based on a SHA256 hash, without embedding the hash.
 
 	Args:
 		sha (str): The SHA256 hash used to generate the flake.
-		dt (float): Delta used for the evolution. Values outside the range (0, growth) may result in unintended behavior. Defaults to 1.
+		dt (float): Delta used for the evolution. Defaults to 1.
 		**kwargs: Additional parameters passed to the PillowFlake class.
 
 	Returns:
-		PIL.Image: The generated flake image, with steganography.
+		PIL.Image: The generated flake image.
 	"""
 	evoH = evoVal(sha[:32], 0, 100) # Extract the first 32 hex characters for humidity evolution
 	evoT = evoVal(sha[32:], -20, -5) # Extract the last 32 hex characters for temperature evolution
@@ -185,10 +267,93 @@ def flakeFromHash(sha, dt=1, **kwargs):
 
 	Flake.drawBranches()
 
-	steg_image = hash2Img(Flake.image, sha) # Embed the hash into the image
+	return Flake.image
+
+def flakeFromHash(sha, dt=1, **kwargs):
+	"""
+	Generates a flake image based on a SHA256 hash.
+	The used hash is embedded to the image with steganography.
+
+	Args:
+		sha (str): The SHA256 hash used to generate the flake.
+		dt (float): Delta used for the evolution. Values outside the range (0, growth) may result in unintended behavior. Defaults to 1.
+		**kwargs: Additional parameters passed to the PillowFlake class.
+
+	Returns:
+		PIL.Image: The generated flake image, with steganography.
+	"""
+	steg_image = hash2Img(_growFlake(sha, dt, **kwargs), sha) # Embed the hash into the image
 
 	return steg_image
 
+def _flakePixels(sha, **kwargs):
+	"""
+	Generates a flake based on a SHA256 hash, as an array of pixels without the embedded hash.
+	Arrays are cheaper to send back from other processes, and to place on a collage.
+
+	Args:
+		sha (str): The SHA256 hash used to generate the flake.
+		**kwargs: Additional parameters passed to the _growFlake function.
+
+	Returns:
+		np.ndarray: The (size, size, 3) RGB pixels of the flake.
+	"""
+	return np.asarray(_growFlake(sha, **kwargs))
+
+# Pixels of the last generated collage flakes, by hash and parameters, oldest first
+_FLAKE_CACHE = OrderedDict()
+_FLAKE_CACHE_BYTES = 50 * 2**20 # Memory budget of the cache, a tile takes 3*size² bytes
+# The parameters that change a flake, the others are for the collage or the CLI
+_FLAKE_PARAMS = ('size', 'bg_color', 'dt', 'thickness', 'growth', 'max_cycles', 'branch_crossing', 'color_young', 'color_old')
+
+def _collageFlakes(hashes, **kwargs):
+	"""
+	Gets the pixels of each distinct flake of a collage, only generating the ones that aren't cached.
+	Flakes only depend on their hash and parameters, so collages made again with some of the
+	same hashes reuse them. The missing flakes are generated in parallel.
+
+	Args:
+		hashes (list): The hashes of the flakes.
+		**kwargs: Additional parameters passed to the _flakePixels function.
+
+	Returns:
+		dict: The (size, size, 3) RGB pixels of each flake, by hash.
+	"""
+	# Lists, such as RGB colors, are keyed as tuples
+	params = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items() if k in _FLAKE_PARAMS))
+	try:
+		hash(params)
+	except TypeError: # Can't be a key, every flake is generated without using the cache
+		params = None
+
+	flakes = {}
+	for sha in dict.fromkeys(hashes):
+		key = (sha, params)
+		if params is not None and key in _FLAKE_CACHE:
+			_FLAKE_CACHE.move_to_end(key)
+			flakes[sha] = _FLAKE_CACHE[key]
+	new = [sha for sha in dict.fromkeys(hashes) if sha not in flakes]
+
+	# Each flake is independent, so they are generated in parallel
+	generate = partial(_flakePixels, **kwargs)
+	if len(new) >= 4:
+		with Pool() as pool:
+			generated = pool.map(generate, new)
+	else: # Starting the workers would take longer than generating a few flakes
+		generated = map(generate, new)
+
+	for sha, pixels in zip(new, generated):
+		flakes[sha] = pixels
+		if params is not None and pixels.nbytes <= _FLAKE_CACHE_BYTES:
+			pixels.flags.writeable = False # Shared with later collages, it's only copied from
+			_FLAKE_CACHE[(sha, params)] = pixels
+
+	# The oldest flakes are dropped until the cache fits its budget, whatever the size of each flake
+	cached = sum(pixels.nbytes for pixels in _FLAKE_CACHE.values())
+	while cached > _FLAKE_CACHE_BYTES:
+		cached -= _FLAKE_CACHE.popitem(last=False)[1].nbytes
+	return flakes
+
 def flakeCollage(N, **kwargs):
 	"""
 	Generates a collage of N flakes.
@@ -201,7 +366,7 @@ def flakeCollage(N, **kwargs):
 	Returns:
 		PIL.Image: The collage of flakes.
 	"""
-	hash_list = [hashSeed('random', True) for _ in range(N)]
+	hash_list = _randomHashes(N)
 
 	return collageFromHashList(hash_list, **kwargs)
 
@@ -218,28 +383,29 @@ def collageFromHashList(hash_list, **kwargs):
 		PIL.Image: The collage of flakes.
 	"""
 	N = len(hash_list)
-	ceil = lambda n: -1 * int(-1 * n // 1) # Rounds up given number
-	rows = kwargs.get('rows', ceil(N**(1/2))) # I believe this is a great default
+	rows = kwargs.get('rows', ceil(sqrt(N))) # I believe this is a great default
 	columns = kwargs.get('columns', rows)
 	size = kwargs.get('size', 700)
 
-	collage = Image.new(mode='RGB', size=(size*columns, size*rows), color=None)
+	cells = rows * columns
+	missing = max(0, cells - N)
+	hashes = hash_list[:cells] + _randomHashes(missing)
 
-	h = 0
-	complete = True
-	for i in range(rows):
-		for j in range(columns):
-			if h < N:
-				flakeimg = flakeFromHash(hash_list[h], **kwargs)
-			else:
-				flakeimg = flakeFromHash(hashSeed('random', True), **kwargs)
-				complete = False
-			collage.paste(flakeimg, (size*j, size*i))
-			h += 1
-	if not complete:
-		print(f"The collage couldn't be filled with the provided hashes. {h - N} flakes were randomly generated.")
+	flakes = _collageFlakes(hashes, **kwargs)
+
+	# The flakes are placed straight on the collage pixels, in order, which only becomes an image at the end.
+	# Left uninitialized, since the padding above guarantees every cell gets a flake.
+	collage = np.empty((size*rows, size*columns, 3), dtype=np.uint8)
+	for h, sha in enumerate(hashes):
+		i, j = divmod(h, columns)
+		collage[size*i:size*(i + 1), size*j:size*(j + 1)] = flakes[sha]
+
+	_embedHashes(collage, hashes, size, columns)
+
+	if missing:
+		print(f"The collage couldn't be filled with the provided hashes. {missing} flakes were randomly generated.")
 
-	return collage
+	return Image.fromarray(collage)
 
 def readFlakes(image, **kwargs):
 	"""
@@ -256,13 +422,30 @@ def readFlakes(image, **kwargs):
 	columns = kwargs.get('columns', 1)
 	flakes = kwargs.get('flakes', [1])
 
-	hashList = []
-	size = int(image.size[0] / columns) # Calculate the size of each flake image
+	if not flakes:
+		return []
+
+	width, height = image.size
+	size = int(width / columns) # Calculate the size of each flake image
+
+	# Calculate the position of each flake in the collage
+	lins, cols = np.divmod(np.asarray(flakes) - 1, columns)
+	lins *= size
+	cols *= size
+
+	# crop pads the pixels outside the image with zeros, which would read as a valid hash
+	outside = (lins < 0) | (lins + 1 > height) | (cols + 128 > width)
+	if outside.any():
+		p = flakes[np.argmax(outside)]
+		raise ValueError(f"flake {p} is outside the {width}x{height} image with {columns} columns")
+
+	# Only the top pixel line of each collage row holds hashes, each one is read once
+	rows, row_index = np.unique(lins, return_inverse=True)
+	strips = np.stack([np.asarray(image.crop((0, int(lin), width, int(lin) + 1)))[0] for lin in rows])
 
-	for p in flakes:
-		pos = (((p - 1) // columns) * size, ((p - 1) % columns) * size) # Calculate the position of the current flake in the collage
-		sha = img2Hash(image, pos)
-		hashList.append(sha)
+	# Gather the LSB of red and green channels of every flake at once, as in img2Hash
+	bits = strips[row_index[:, np.newaxis], cols[:, np.newaxis] + np.arange(128), :2] & 1
+	hashList = [sha.tobytes().hex() for sha in np.packbits(bits.reshape(len(flakes), 256), axis=1)]
 	return hashList
 
 
@@ -343,7 +526,8 @@ def main():
 	)
 
 	args = parser.parse_args()
-	kwargs = {k: v for k, v in vars(args).items() if v} # filter None values
+	# filter None values, and the opened files, which aren't flake parameters (and can't be sent to other processes)
+	kwargs = {k: v for k, v in vars(args).items() if v and k not in ('hashes', 'read')}
 
 	if args.read: # -r/--read
 		image = Image.open(args.read)
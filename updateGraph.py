@@ -17,8 +17,9 @@ humidities = np.linspace(0, 100, 100)
 
 # Create a 2D grid for temperature and humidity
 T, H = np.meshgrid(temperatures, humidities)
-# Calculate the growth multiplier for each combination of temperature and humidity
-G = interp(T, -5, -20, 0, 0.3) + interp(H, 0, 100, 0, 0.7)
+# Calculate the growth multiplier for each combination of temperature and humidity,
+# each term only depends on one axis, so it's interpolated once per value and broadcast to the grid
+G = interp(temperatures, -5, -20, 0, 0.3)[np.newaxis, :] + interp(humidities, 0, 100, 0, 0.7)[:, np.newaxis]
 
 # Calculate the reference line for humidity
 humidity_line = -4 * temperatures
@@ -33,12 +34,12 @@ plt.plot(temperatures, humidity_line, color='#2AB6E8', linewidth=2, label='H = -
 plt.plot(temperatures, angle_line, color='#9de800', linewidth=2, label='Branch Angle')
 
 # Create a mask for the branch condition and plot its contour
-branchMask = (G < 0.35) & (T < -10)
+branchMask = (G < 0.35) & (temperatures < -10)[np.newaxis, :]
 plt.contour(T, H, branchMask, colors='#fc3063', linewidths=2)
 plt.text(-15, 10, 'Branch', color='#fc3063', fontsize=16)
 
 # Create a mask for the thick condition and plot its contour
-thickMask = (G > 0.3) & (H < 50) & (H > -4*T)
+thickMask = (G > 0.3) & (humidities < 50)[:, np.newaxis] & (H > -4*T)
 plt.contour(T, H, thickMask, colors='#0a329b', linewidths=2)
 plt.text(-10, 42, 'Thick', color='#0a329b', fontsize=16)
 
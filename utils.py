@@ -3,7 +3,14 @@
 
 # This module provides some usefull functions for other modules.
 
-from math import sin, cos
+from math import sin, cos, tan, pi
+
+# Angles used all over the snowflake, they never change
+PI_2 = pi/2
+PI_3 = pi/3
+PI_6 = pi/6
+TWO_PI = 2*pi
+TAN_PI_3 = tan(PI_3)
 
 def interp(value, original_min, original_max, target_min, target_max):
 	
@@ -34,11 +41,44 @@ def rotatePoints(points, center, angle):
 	Returns:
 		list of tuple: The list of rotated (x, y) points.
 	"""
-	rotPoints = []
 	cX, cY = center
-	for point in points:
-		x, y = point
-		rotX = ((x - cX) * cos(angle)) + ((y - cY) * sin(angle))
-		rotY = -((x - cX) * sin(angle)) + ((y - cY) * cos(angle))
-		rotPoints.append((rotX + cX, rotY + cY))
-	return tuple(rotPoints)
\ No newline at end of file
+	c, s = cos(angle), sin(angle) # Same for every point
+	return tuple(
+		(((x - cX) * c) + ((y - cY) * s) + cX, -((x - cX) * s) + ((y - cY) * c) + cY)
+		for x, y in points
+	)
+
+def rotateSegments(segments, center, angle):
+	"""
+	Rotate a list of segments around a center point by a given angle.
+	The sine and cosine are computed once and shared by every point.
+
+	Args:
+		segments (list of tuples): A list of ((x0, y0), (x1, y1)) segments to be rotated.
+		center (tuple): The (x, y) coordinates of the center point.
+		angle (float): The angle of rotation in radians.
+
+	Returns:
+		list of tuple: The list of rotated segments.
+	"""
+	return rotateSegmentsTrig(segments, center, cos(angle), sin(angle))
+
+def rotateSegmentsTrig(segments, center, c, s):
+	"""
+	Rotate a list of segments around a center point, from the cosine and sine of the angle.
+	Useful when the same angles are used over and over.
+
+	Args:
+		segments (list of tuples): A list of ((x0, y0), (x1, y1)) segments to be rotated.
+		center (tuple): The (x, y) coordinates of the center point.
+		c (float): The cosine of the angle of rotation.
+		s (float): The sine of the angle of rotation.
+
+	Returns:
+		list of tuple: The list of rotated segments.
+	"""
+	cX, cY = center
+	return [(
+		(((x0 - cX) * c) + ((y0 - cY) * s) + cX, -((x0 - cX) * s) + ((y0 - cY) * c) + cY),
+		(((x1 - cX) * c) + ((y1 - cY) * s) + cX, -((x1 - cX) * s) + ((y1 - cY) * c) + cY)
+	) for (x0, y0), (x1, y1) in segments]
\ No newline at end of file